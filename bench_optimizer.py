@@ -0,0 +1,201 @@
+"""Бенчмарк и проверка корректности решателей /optimize.
+
+Генерирует воспроизводимые (по seed) корзины с разным числом позиций,
+магазинов, долей отсутствующих цен и лимитом магазинов K, решает каждую
+моделью PuLP/CBC и точным перебором из optimizer.solve, сверяет значения
+целевой функции и печатает JSON с распределением времени.
+
+    python bench_optimizer.py --output bench.json
+    python bench_optimizer.py --quick --compare bench.json
+
+Код возврата 1, если решатели разошлись или (с --compare) время выросло.
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+
+import optimizer
+
+ITEMS = (5, 10, 20, 40)
+STORES = (3, 8, 15)
+MISSING = (0.1, 0.3, 0.6)
+MAX_STORES = (1, 2, 3)
+
+QUICK_ITEMS = (10, 40)
+QUICK_STORES = (5, 15)
+QUICK_MISSING = (0.3,)
+QUICK_MAX_STORES = (2,)
+
+_TOLERANCE = 1e-6
+
+
+def generate(rng, n_items, n_stores, missing, min_order_share):
+    """Одна корзина: (costs, stores, trip_costs, min_orders)"""
+    stores = [f"S{j}" for j in range(n_stores)]
+    markup = [rng.uniform(0.85, 1.25) for _ in stores]
+
+    costs = []
+    for _ in range(n_items):
+        base = rng.uniform(30, 400)
+        quantity = rng.choice((1, 1, 1, 2, 3))
+        row = [round(base * markup[j] * rng.uniform(0.9, 1.1), 2) * quantity
+               if rng.random() >= missing else None
+               for j in range(n_stores)]
+        if all(cost is None for cost in row):
+            j = rng.randrange(n_stores)
+            row[j] = round(base * markup[j], 2) * quantity
+        costs.append(row)
+
+    trip_costs = {store: rng.choice((0, 0, 99, 149, 199)) for store in stores}
+    min_orders = {store: rng.choice((300, 500, 1000))
+                  if rng.random() < min_order_share else 0
+                  for store in stores}
+    return costs, stores, trip_costs, min_orders
+
+
+def run_cbc(costs, stores, k, trip_costs, min_orders):
+    t0 = time.perf_counter()
+    model = optimizer.build_milp(costs, stores, k, trip_costs, min_orders)
+    t1 = time.perf_counter()
+    solution = optimizer.run_milp(model, costs, stores, trip_costs)
+    t2 = time.perf_counter()
+    return solution, {'build': t1 - t0, 'solve': t2 - t1, 'fallback': False}
+
+
+def run_exact(costs, stores, k, trip_costs, min_orders):
+    """Тот же путь, что и optimizer.solve, но с отметкой о переходе на CBC"""
+    t0 = time.perf_counter()
+    try:
+        solution = optimizer.solve_exact(costs, stores, k, trip_costs, min_orders)
+        fallback = False
+    except optimizer.NodeLimitExceeded:
+        solution = optimizer.solve_milp(costs, stores, k, trip_costs, min_orders)
+        fallback = True
+    t1 = time.perf_counter()
+    return solution, {'build': 0.0, 'solve': t1 - t0, 'fallback': fallback}
+
+
+SOLVERS = {'cbc': run_cbc, 'exact': run_exact}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples):
+    total = [s['build'] + s['solve'] for s in samples]
+    return {
+        'total_ms': {name: percentile(total, q) * 1000
+                     for name, q in (('p50', 0.5), ('p95', 0.95), ('max', 1.0))},
+        'build_ms_p50': percentile([s['build'] for s in samples], 0.5) * 1000,
+        'solve_ms_p50': percentile([s['solve'] for s in samples], 0.5) * 1000,
+        'fallbacks': sum(s['fallback'] for s in samples),
+    }
+
+
+def objective(solution):
+    return None if solution is None else round(solution.total, 6)
+
+
+def bench(grid, instances, seed, min_order_share):
+    results = []
+    for n_items, n_stores, missing, k in grid:
+        rng = random.Random(f"{seed}-{n_items}-{n_stores}-{missing}-{k}")
+        samples = {name: [] for name in SOLVERS}
+        mismatches = []
+
+        for index in range(instances):
+            costs, stores, trip_costs, min_orders = generate(
+                rng, n_items, n_stores, missing, min_order_share)
+
+            objectives = {}
+            for name, run in SOLVERS.items():
+                solution, timing = run(costs, stores, k, trip_costs, min_orders)
+                samples[name].append(timing)
+                objectives[name] = objective(solution)
+
+            values = list(objectives.values())
+            if any((a is None) != (b is None) or
+                   (a is not None and abs(a - b) > _TOLERANCE)
+                   for a, b in zip(values, values[1:])):
+                mismatches.append({'instance': index, 'objectives': objectives})
+
+        results.append({
+            'items': n_items, 'stores': n_stores, 'missing': missing, 'k': k,
+            'solvers': {name: summarize(s) for name, s in samples.items()},
+            'mismatches': mismatches,
+        })
+    return results
+
+
+def regressions(results, baseline, factor):
+    """Конфигурации, где p95 решателя выросло больше чем в factor раз"""
+    key = lambda r: (r['items'], r['stores'], r['missing'], r['k'])
+    previous = {key(r): r for r in baseline['configs']}
+
+    found = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        for name, stats in result['solvers'].items():
+            if name not in old['solvers']:
+                continue
+            before = old['solvers'][name]['total_ms']['p95']
+            after = stats['total_ms']['p95']
+            if after > before * factor and after - before > 1:
+                found.append({'config': key(result), 'solver': name,
+                              'p95_before_ms': before, 'p95_after_ms': after})
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--instances', type=int, default=5,
+                        help="корзин на каждую конфигурацию")
+    parser.add_argument('--min-order-share', type=float, default=0.3,
+                        help="доля магазинов с минимальной суммой заказа")
+    parser.add_argument('--quick', action='store_true',
+                        help="небольшая сетка для быстрой проверки")
+    parser.add_argument('--output', help="файл для JSON вместо stdout")
+    parser.add_argument('--compare', help="JSON прошлого прогона для сравнения")
+    parser.add_argument('--factor', type=float, default=1.5,
+                        help="во сколько раз должно вырасти p95, чтобы считать регрессией")
+    args = parser.parse_args()
+
+    if args.quick:
+        grid = itertools.product(QUICK_ITEMS, QUICK_STORES, QUICK_MISSING, QUICK_MAX_STORES)
+    else:
+        grid = itertools.product(ITEMS, STORES, MISSING, MAX_STORES)
+
+    results = bench(list(grid), args.instances, args.seed, args.min_order_share)
+    report = {
+        'meta': {'seed': args.seed, 'instances': args.instances,
+                 'min_order_share': args.min_order_share,
+                 'node_limit': optimizer.NODE_LIMIT},
+        'configs': results,
+        'mismatches': sum(len(r['mismatches']) for r in results),
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = regressions(results, json.load(f), args.factor)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    failed = report['mismatches'] or report.get('regressions')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Замер времени холодного старта бота до первого ответа.
+
+Каждый прогон запускается в отдельном процессе: импорт модулей бота,
+загрузка каталога и обработка /calculate с фиктивным сообщением.
+
+    python bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import catalog
+
+CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+
+from types import SimpleNamespace
+import handlers
+import catalog
+from database import init_db
+
+t_import = time.perf_counter()
+init_db()
+cat = catalog.load()
+t_catalog = time.perf_counter()
+
+answered = []
+
+async def answer(text, **kwargs):
+    answered.append(time.perf_counter())
+
+message = SimpleNamespace(from_user=SimpleNamespace(id=1), answer=answer)
+product_name = next(iter(cat.price_dict), None)
+if product_name:
+    handlers.get_session(1).cart[product_name] = {'quantity': 1}
+asyncio.run(handlers.cmd_calculate(message))
+
+print(json.dumps({
+    'import': t_import - t0,
+    'catalog': t_catalog - t_import,
+    'first_response': answered[0] - t0,
+}))
+"""
+
+
+def run_once():
+    out = subprocess.run([sys.executable, "-c", CHILD], check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench(mode: str, runs: int):
+    samples = []
+    for _ in range(runs):
+        if mode == "db" and os.path.exists(catalog.SNAPSHOT_PATH):
+            os.unlink(catalog.SNAPSHOT_PATH)
+        samples.append(run_once())
+
+    return {
+        key: {
+            'median_ms': statistics.median(s[key] for s in samples) * 1000,
+            'max_ms': max(s[key] for s in samples) * 1000,
+        }
+        for key in samples[0]
+    }
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # "db" — без снимка, каталог читается из SQLite; "snapshot" — из файла
+    result = {mode: bench(mode, runs) for mode in ("db", "snapshot")}
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,619 @@
+import logging
+import math
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import ItemsView, Mapping, ValuesView
+
+from database import SessionLocal, DATABASE_URL
+from models import Product, Store
+from sqlalchemy.orm import Session
+from units import normalize_product_name, unit_measure
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT", "catalog.snap")
+SNAPSHOT_MAGIC = b"PCAT"
+SNAPSHOT_FORMAT = 5
+# Windows не даёт заменить файл, пока он отображён в память, поэтому там
+# каждая версия пишется в свой файл catalog.snap.<версия>, а в SNAPSHOT_PATH
+# лежит только имя текущего
+VERSIONED_SNAPSHOTS = os.name == "nt"
+
+# magic, формат, версия каталога, mtime_ns и размер файла БД на момент записи,
+# затем число товаров, магазинов, групп и строк прайса
+_HEADER = struct.Struct("<4sHIqqIIII")
+
+# Секции файла в порядке записи: (имя, typecode array/memoryview)
+_SECTIONS = (
+    ('product_offsets', 'I'), ('product_blob', 'B'),
+    ('store_offsets', 'I'), ('store_blob', 'B'),
+    ('group_offsets', 'I'), ('group_blob', 'B'),
+    ('matrix', 'd'),              # [product × store] мин. цена, NaN — нет цены
+    ('amount', 'd'),              # [product] кг или л в товаре, NaN — нет
+    ('unit', 'B'),                # [product] индекс в _UNITS
+    ('member_offsets', 'I'),      # [group + 1]
+    ('members', 'I'),             # товары группы по возрастанию цены за кг/л
+    ('equiv_offsets', 'I'),       # [group + 1] строки замен группы
+    ('equiv_fat', 'd'),           # [equiv] жирность, NaN — не указана
+    ('equiv_unit', 'B'),          # [equiv] индекс в _UNITS
+    ('group_min_price', 'd'),     # [equiv × store] мин. ₽ за кг/л
+    ('group_min_product', 'I'),   # [equiv × store] какой товар
+    ('row_product', 'I'), ('row_store', 'I'), ('row_price', 'd'),
+    ('trip_cost', 'd'),           # [store] стоимость поездки или доставки
+    ('min_order', 'd'),           # [store] минимальная сумма заказа
+)
+_OFFSETS = struct.Struct(f"<{len(_SECTIONS) * 2}Q")
+_UNITS = (None, 'кг', 'л')
+
+
+class Catalog:
+    """Каталог в памяти процесса: строится из базы и записывается в снимок"""
+
+    identity = None
+
+    def __init__(self, names=(), stores=(), prices=(), units=None,
+                 store_terms=None, version=0):
+        self.version = version
+        self.names = list(names)
+        self.stores = list(stores)
+        self.prices = list(prices)
+        # {product_name: (fat, volume, weight, pack)}
+        self.units = dict(units or {})
+        # {store: (trip_cost, min_order)} для магазинов из прайса
+        self.store_terms = {store: (store_terms or {}).get(store, (0.0, 0.0))
+                            for store in set(self.stores)}
+
+        # {product_name: {store: min_price}}
+        self.price_dict = {}
+        for name, store, price in self.rows():
+            store_prices = self.price_dict.setdefault(name, {})
+            if store not in store_prices or price < store_prices[store]:
+                store_prices[store] = price
+
+        # {product_name: normalized_name} и {normalized_name: set(product_name)}
+        self.norm_names = {}
+        self.grouped_products = {}
+        for name in self.price_dict:
+            norm_name = normalize_product_name(name)
+            self.norm_names[name] = norm_name
+            self.grouped_products.setdefault(norm_name, set()).add(name)
+
+        # {product_name: (amount, 'кг' | 'л')} и {product_name: {store: ₽ за кг/л}}
+        self.measures = {}
+        self.unit_price_dict = {}
+        for name, store_prices in self.price_dict.items():
+            _, volume, weight, pack = self.units.get(name, (None,) * 4)
+            amount, unit = unit_measure(volume, weight, pack)
+            if amount:
+                self.measures[name] = (amount, unit)
+                self.unit_price_dict[name] = {
+                    store: price / amount for store, price in store_prices.items()}
+
+        # {(normalized_name, fat, unit): {store: (₽ за кг/л, product_name)}} —
+        # самый дешёвый вариант группы в каждом магазине для замен в корзине.
+        # Жирность в ключе: заменяется только фасовка, а не 2,5% на 3,2%
+        self.group_min = {}
+        for name, unit_prices in self.unit_price_dict.items():
+            store_min = self.group_min.setdefault(
+                self.equivalent_key(name), {})
+            for store, unit_price in unit_prices.items():
+                if store not in store_min or unit_price < store_min[store][0]:
+                    store_min[store] = (unit_price, name)
+
+        # {normalized_name: [product_name, ...]} по возрастанию лучшей цены за
+        # кг/л; товары без веса и объёма идут в конце по алфавиту
+        self.by_unit_price = {
+            norm_name: sorted(names, key=self._unit_price_key)
+            for norm_name, names in self.grouped_products.items()
+        }
+
+    def equivalent_key(self, name):
+        return self.norm_names[name], self.units[name][0], self.measures[name][1]
+
+    def _unit_price_key(self, name):
+        best = self.best_unit_price(name)
+        return (best is None, best or 0, name)
+
+    def best_unit_price(self, name):
+        unit_prices = self.unit_price_dict.get(name)
+        return min(unit_prices.values()) if unit_prices else None
+
+    def rows(self):
+        return zip(self.names, self.stores, self.prices)
+
+    def find_groups(self, predicate):
+        """Группы, чьё название прошло predicate.
+
+        Выдаёт (norm_name, [(product_name, {store: price}), ...]), товары в
+        порядке by_unit_price.
+        """
+        for norm_name, names in self.by_unit_price.items():
+            if predicate(norm_name):
+                yield norm_name, [(name, self.price_dict[name]) for name in names]
+
+    def group_equivalents(self, norm_name):
+        """Варианты замен группы [(fat, unit), ...], сначала самый дешёвый за кг/л"""
+        result = []
+        for name in self.by_unit_price.get(norm_name, []):
+            if name in self.measures:
+                _, fat, unit = self.equivalent_key(name)
+                if (fat, unit) not in result:
+                    result.append((fat, unit))
+        return result
+
+    def __len__(self):
+        return len(self.names)
+
+    def __bool__(self):
+        return bool(self.names)
+
+
+class _Strings:
+    """Отсортированная таблица строк внутри mmap с двоичным поиском"""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _raw(self, i):
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i):
+        return self._raw(i).decode()
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def index(self, text):
+        key = text.encode()
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._raw(lo) == key:
+            return lo
+        return None
+
+
+class _View(Mapping):
+    """Словарь только для чтения поверх MappedCatalog"""
+
+    def __init__(self, catalog, keys, value):
+        self._catalog = catalog
+        self._keys = keys
+        self._value = value
+
+    def __getitem__(self, key):
+        i = self._keys.index(key) if isinstance(key, str) else None
+        if i is None:
+            raise KeyError(key)
+        return self._value(i)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _pairs(self):
+        """(ключ, значение) подряд по индексам, без двоичного поиска на ключ"""
+        for i, key in enumerate(self._keys):
+            yield key, self._value(i)
+
+    def items(self):
+        return _ItemsView(self)
+
+    def values(self):
+        return _ValuesView(self)
+
+
+class _ItemsView(ItemsView):
+    def __iter__(self):
+        return self._mapping._pairs()
+
+
+class _ValuesView(ValuesView):
+    def __iter__(self):
+        return (value for _, value in self._mapping._pairs())
+
+
+class MappedCatalog:
+    """Каталог, отображённый из файла снимка через mmap.
+
+    Все процессы видят одни и те же страницы файла, поэтому каталог не
+    копируется в память каждого процесса. Интерфейс совпадает с Catalog.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            st = os.fstat(f.fileno())
+        self.identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        (_, _, self.version, self.db_mtime_ns, self.db_size, self.n_products,
+         self.n_stores, self.n_groups, self.n_rows) = _HEADER.unpack_from(self._mm)
+
+        offsets = _OFFSETS.unpack_from(self._mm, _HEADER.size)
+        buf = memoryview(self._mm)
+        for k, (name, typecode) in enumerate(_SECTIONS):
+            start, length = offsets[2 * k], offsets[2 * k + 1]
+            setattr(self, f"_{name}", buf[start:start + length].cast(typecode))
+
+        self.products = _Strings(self._product_offsets, self._product_blob)
+        self.store_names = list(_Strings(self._store_offsets, self._store_blob))
+        self.store_terms = {store: (self._trip_cost[s], self._min_order[s])
+                            for s, store in enumerate(self.store_names)}
+        self.groups = _Strings(self._group_offsets, self._group_blob)
+
+        self.price_dict = _View(self, self.products, self._prices)
+        self.measures = _MeasureView(self, self.products, self._measure)
+        self.grouped_products = _View(
+            self, self.groups, lambda g: set(self._group_members(g)))
+        self.by_unit_price = _View(self, self.groups, self._group_members)
+        self.group_min = _GroupMinView(self)
+
+    def _prices(self, p):
+        row = self._matrix[p * self.n_stores:(p + 1) * self.n_stores]
+        return {store: price for store, price in zip(self.store_names, row)
+                if not math.isnan(price)}
+
+    def _measure(self, p):
+        unit = _UNITS[self._unit[p]]
+        return (self._amount[p], unit) if unit else None
+
+    def _group_members(self, g):
+        start, end = self._member_offsets[g], self._member_offsets[g + 1]
+        return [self.products[p] for p in self._members[start:end]]
+
+    def best_unit_price(self, name):
+        p = self.products.index(name)
+        if p is None or not self._unit[p]:
+            return None
+        prices = self._matrix[p * self.n_stores:(p + 1) * self.n_stores]
+        known = [price for price in prices if not math.isnan(price)]
+        return min(known) / self._amount[p] if known else None
+
+    def find_groups(self, predicate):
+        """Как Catalog.find_groups: товары и цены читаются по индексам и
+        только у подошедших групп"""
+        for g, norm_name in enumerate(self.groups):
+            if predicate(norm_name):
+                start, end = self._member_offsets[g], self._member_offsets[g + 1]
+                yield norm_name, [(self.products[p], self._prices(p))
+                                  for p in self._members[start:end]]
+
+    def _equivalent(self, e):
+        fat = self._equiv_fat[e]
+        return (None if math.isnan(fat) else fat), _UNITS[self._equiv_unit[e]]
+
+    def group_equivalents(self, norm_name):
+        """Варианты замен группы [(fat, unit), ...], сначала самый дешёвый за кг/л"""
+        g = self.groups.index(norm_name)
+        if g is None:
+            return []
+        return [self._equivalent(e)
+                for e in range(self._equiv_offsets[g], self._equiv_offsets[g + 1])]
+
+    def rows(self):
+        for p, s, price in zip(self._row_product, self._row_store, self._row_price):
+            yield self.products[p], self.store_names[s], price
+
+    def __len__(self):
+        return self.n_rows
+
+    def __bool__(self):
+        return self.n_rows > 0
+
+
+class _MeasureView(_View):
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        i = self._keys.index(key) if isinstance(key, str) else None
+        return i is not None and self._catalog._unit[i] != 0
+
+    def __iter__(self):
+        units = self._catalog._unit
+        return (name for i, name in enumerate(self._keys) if units[i])
+
+    def _pairs(self):
+        units = self._catalog._unit
+        for i, key in enumerate(self._keys):
+            if units[i]:
+                yield key, self._value(i)
+
+    def __len__(self):
+        return sum(1 for unit in self._catalog._unit if unit)
+
+
+class _GroupMinView(Mapping):
+    """{(normalized_name, fat, unit): {store: (₽ за кг/л, product_name)}}"""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __getitem__(self, key):
+        cat = self._catalog
+        norm_name, fat, unit = key
+        g = cat.groups.index(norm_name)
+        if g is None:
+            raise KeyError(key)
+
+        for e in range(cat._equiv_offsets[g], cat._equiv_offsets[g + 1]):
+            if cat._equivalent(e) == (fat, unit):
+                break
+        else:
+            raise KeyError(key)
+
+        start = e * cat.n_stores
+        result = {}
+        for s, store in enumerate(cat.store_names):
+            unit_price = cat._group_min_price[start + s]
+            if not math.isnan(unit_price):
+                result[store] = (unit_price,
+                                 cat.products[cat._group_min_product[start + s]])
+        return result
+
+    def __iter__(self):
+        cat = self._catalog
+        for g, norm_name in enumerate(cat.groups):
+            for e in range(cat._equiv_offsets[g], cat._equiv_offsets[g + 1]):
+                yield (norm_name, *cat._equivalent(e))
+
+    def __len__(self):
+        return len(self._catalog._equiv_unit)
+
+
+_catalog = None
+
+
+def _file_identity(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _snapshot_file(path: str):
+    """Файл с данными снимка: сам path или версия, на которую он указывает"""
+    if not VERSIONED_SNAPSHOTS:
+        return path
+    try:
+        with open(path, encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(os.path.dirname(path), name) if name else None
+
+
+def get_catalog():
+    """Текущий каталог процесса.
+
+    Если другой процесс опубликовал новый снимок (файл заменён через
+    os.replace), каталог переотображается при следующем обращении.
+    """
+    global _catalog
+
+    data_path = _snapshot_file(SNAPSHOT_PATH)
+    identity = _file_identity(data_path) if data_path else None
+    if _catalog is None or identity != _catalog.identity:
+        mapped = read_snapshot(check_db=False)
+        if mapped is not None:
+            if _catalog is not None:
+                logger.info("Catalog remapped: v%d -> v%d",
+                            _catalog.version, mapped.version)
+            _catalog = mapped
+        elif _catalog is None:
+            _catalog = Catalog()
+    return _catalog
+
+
+def _db_stamp():
+    """mtime и размер файла SQLite, чтобы не поднять устаревший снимок"""
+    if not DATABASE_URL.startswith("sqlite:///"):
+        return 0, 0
+    try:
+        st = os.stat(DATABASE_URL[len("sqlite:///"):])
+    except OSError:
+        return 0, 0
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_from_db(version: int) -> Catalog:
+    db: Session = SessionLocal()
+    rows = db.query(Product.name, Product.store, Product.price, Product.fat,
+                    Product.volume, Product.weight, Product.pack).all()
+    store_terms = {store.name: (store.trip_cost, store.min_order)
+                   for store in db.query(Store).all()}
+    db.close()
+
+    return Catalog(
+        names=[row[0] for row in rows],
+        stores=[row[1] for row in rows],
+        prices=[row[2] for row in rows],
+        units={row[0]: tuple(row[3:]) for row in rows},
+        store_terms=store_terms,
+        version=version,
+    )
+
+
+def _string_table(strings):
+    offsets = array('I', [0])
+    blob = bytearray()
+    for text in strings:
+        blob += text.encode()
+        offsets.append(len(blob))
+    return offsets, blob
+
+
+def write_snapshot(catalog: Catalog, path: str = SNAPSHOT_PATH):
+    """Атомарно записывает каталог в файл, пригодный для mmap"""
+    products = sorted(catalog.price_dict)
+    stores = sorted(set(catalog.stores))
+    groups = sorted(catalog.grouped_products)
+    product_index = {name: i for i, name in enumerate(products)}
+    store_index = {store: i for i, store in enumerate(stores)}
+
+    matrix = array('d', [math.nan]) * (len(products) * len(stores))
+    amount = array('d', [math.nan]) * len(products)
+    unit = array('B', [0]) * len(products)
+    for p, name in enumerate(products):
+        for store, price in catalog.price_dict[name].items():
+            matrix[p * len(stores) + store_index[store]] = price
+        if name in catalog.measures:
+            amount[p], unit_name = catalog.measures[name]
+            unit[p] = _UNITS.index(unit_name)
+
+    member_offsets = array('I', [0])
+    members = array('I')
+    equiv_offsets = array('I', [0])
+    equiv_fat = array('d')
+    equiv_unit = array('B')
+    group_min_price = array('d')
+    group_min_product = array('I')
+    for norm_name in groups:
+        members.extend(product_index[name]
+                       for name in catalog.by_unit_price[norm_name])
+        member_offsets.append(len(members))
+        for fat, unit_name in catalog.group_equivalents(norm_name):
+            equiv_fat.append(math.nan if fat is None else fat)
+            equiv_unit.append(_UNITS.index(unit_name))
+            start = len(group_min_price)
+            group_min_price.extend([math.nan] * len(stores))
+            group_min_product.extend([0] * len(stores))
+            for store, (unit_price, name) in catalog.group_min[
+                    (norm_name, fat, unit_name)].items():
+                group_min_price[start + store_index[store]] = unit_price
+                group_min_product[start + store_index[store]] = product_index[name]
+        equiv_offsets.append(len(equiv_fat))
+
+    sections = (
+        *_string_table(products), *_string_table(stores), *_string_table(groups),
+        matrix, amount, unit, member_offsets, members,
+        equiv_offsets, equiv_fat, equiv_unit, group_min_price, group_min_product,
+        array('I', (product_index[name] for name in catalog.names)),
+        array('I', (store_index[store] for store in catalog.stores)),
+        array('d', catalog.prices),
+        array('d', (catalog.store_terms[store][0] for store in stores)),
+        array('d', (catalog.store_terms[store][1] for store in stores)),
+    )
+
+    mtime_ns, size = _db_stamp()
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, catalog.version,
+                          mtime_ns, size, len(products), len(stores),
+                          len(groups), len(catalog))
+
+    offsets = []
+    position = _HEADER.size + _OFFSETS.size
+    for section in sections:
+        position += -position % 8
+        offsets += [position, len(bytes(section))]
+        position += offsets[-1]
+
+    data_path = f"{path}.{catalog.version}" if VERSIONED_SNAPSHOTS else path
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(_OFFSETS.pack(*offsets))
+        for k, section in enumerate(sections):
+            f.write(b"\0" * (offsets[2 * k] - f.tell()))
+            f.write(bytes(section))
+    os.replace(tmp_path, data_path)
+
+    if VERSIONED_SNAPSHOTS:
+        _point_to(path, data_path)
+
+
+def _point_to(path: str, data_path: str):
+    """Переключает SNAPSHOT_PATH на новую версию и удаляет старые файлы.
+
+    Файл, который ещё отображён, удалить нельзя — он уйдёт при следующей
+    публикации.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(data_path))
+    os.replace(tmp_path, path)
+
+    prefix = os.path.basename(path) + "."
+    current = os.path.basename(data_path)
+    directory = os.path.dirname(path) or "."
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and name != current:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def read_snapshot(path: str = SNAPSHOT_PATH, check_db: bool = True):
+    """Отображает снимок каталога в память.
+
+    Возвращает None, если файла нет, он другого формата или, при check_db,
+    устарел относительно базы данных.
+    """
+    path = _snapshot_file(path)
+    if path is None:
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+
+    if len(header) < _HEADER.size:
+        return None
+
+    magic, fmt, _, mtime_ns, size, *_ = _HEADER.unpack(header)
+    if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT:
+        return None
+    if check_db and (mtime_ns, size) != _db_stamp():
+        return None
+
+    try:
+        return MappedCatalog(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def load() -> MappedCatalog:
+    """Загрузка каталога при старте: сначала снимок, иначе база данных"""
+    global _catalog
+
+    catalog = read_snapshot()
+    if catalog is None:
+        logger.info("Catalog snapshot missing or stale, reading database")
+        write_snapshot(_read_from_db(version=1))
+        catalog = read_snapshot(check_db=False)
+
+    _catalog = catalog
+    logger.info("Catalog v%d loaded: %d records",
+                catalog.version, len(catalog))
+    return catalog
+
+
+def reload() -> MappedCatalog:
+    """Перечитывает базу после импорта или очистки и публикует новый снимок.
+
+    Остальные процессы подхватят его при следующем get_catalog().
+    """
+    global _catalog
+
+    write_snapshot(_read_from_db(version=get_catalog().version + 1))
+
+    _catalog = read_snapshot(check_db=False)
+    return _catalog
@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
-from models import Base
+from models import Base, Product
+from units import UNIT_COLUMNS, parse_units
 
 DATABASE_URL = "sqlite:///bot.db"
 
@@ -10,6 +11,28 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _migrate_unit_columns()
+
+
+def _migrate_unit_columns():
+    """Добавляет столбцы единиц в старую базу и заполняет их по названиям"""
+    existing = {column['name']
+                for column in inspect(engine).get_columns(Product.__tablename__)}
+    missing = [column for column in UNIT_COLUMNS if column not in existing]
+    if not missing:
+        return
+
+    with engine.begin() as conn:
+        for column in missing:
+            conn.execute(text(
+                f"ALTER TABLE {Product.__tablename__} ADD COLUMN {column} FLOAT"))
+
+    db = SessionLocal()
+    for product in db.query(Product).all():
+        for column, val in parse_units(product.name).items():
+            setattr(product, column, val)
+    db.commit()
+    db.close()
 
 
 def get_db():
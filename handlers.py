@@ -4,13 +4,16 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 from aiogram.types import ContentType
 from database import SessionLocal
-from models import Product, Admin
+from models import Admin
 from sqlalchemy.orm import Session
-from pulp import LpProblem, LpMinimize, LpVariable, lpSum, LpBinary, value
-import pandas as pd
+from catalog import get_catalog
+from units import normalize_product_name
+import asyncio
+import functools
+import importer
+import jobs
+import optimizer
 import tempfile
-import os
-import re
 
 
 class CartStates(StatesGroup):
@@ -26,7 +29,9 @@ class ExcelUploadStates(StatesGroup):
 
 class UserSession:
     def __init__(self):
-        self.cart = {}  # {product_name: {quantity: float}}
+        # {product_name: {quantity: float}}; у позиций «любой аналог» ещё
+        # group, fat и unit, а quantity задаётся в кг или л
+        self.cart = {}
         self.active = True
 
 
@@ -39,22 +44,145 @@ def get_session(user_id: int) -> UserSession:
     return sessions[user_id]
 
 
-def normalize_product_name(name: str) -> str:
-    name = name.lower().strip()
+# Сколько магазинов можно объехать в /optimize
+MAX_STORES = 2
 
-    name = re.sub(r'\d+[.,]?\d*\s*%', '', name)
+# Inline-режим: размер страницы, сколько секунд Telegram кэширует ответ и
+# сколько запросов помнит локальный кэш
+INLINE_PAGE_SIZE = 20
+INLINE_CACHE_TIME = 300
+INLINE_CACHE_SIZE = 1024
 
-    name = re.sub(r'\d+[.,]?\d*\s*[лЛlL]', '', name)
-    name = re.sub(r'\d+[.,]?\d*\s*[гГgG]', '', name)
-    name = re.sub(r'\d+[.,]?\d*\s*[кК][гГ]', '', name)
+SORT_BY_UNIT_PRICE = "Сортировать по цене за кг/л"
+# Сколько кнопок «любой аналог» (по жирности и единице) показывать в группе
+MAX_EQUIVALENTS = 4
 
-    name = re.sub(r'\d+\s*шт', '', name)
-    name = re.sub(r'\d+\s*пак', '', name)
 
-    name = re.sub(r'[,\s]+$', '', name)
-    name = name.strip()
+def format_fat(fat) -> str:
+    return f"{fat:g}".replace('.', ',') + "%"
 
-    return name
+
+def equivalent_label(fat, unit) -> str:
+    """Кнопка «любой аналог»: меняется только фасовка, жирность остаётся"""
+    fat_text = f" {format_fat(fat)}" if fat is not None else ""
+    return f"Любой аналог{fat_text} (по цене за {unit})"
+
+
+def group_equivalents(cat, norm_name):
+    """{текст кнопки: (fat, unit)} для замен внутри группы"""
+    if not norm_name:
+        return {}
+    return {equivalent_label(fat, unit): (fat, unit)
+            for fat, unit in cat.group_equivalents(norm_name)[:MAX_EQUIVALENTS]}
+
+
+def variants_keyboard(cat, variants, norm_name=None, by_unit_price=False):
+    """Клавиатура выбора варианта товара"""
+    if by_unit_price and norm_name in cat.by_unit_price:
+        ordered = cat.by_unit_price[norm_name]
+    else:
+        ordered = sorted(variants)
+
+    keyboard_buttons = []
+    for variant in ordered[:10]:
+        keyboard_buttons.append([types.KeyboardButton(text=variant)])
+    equivalents = group_equivalents(cat, norm_name)
+    if equivalents:
+        for label in equivalents:
+            keyboard_buttons.append([types.KeyboardButton(text=label)])
+        if not by_unit_price:
+            keyboard_buttons.append(
+                [types.KeyboardButton(text=SORT_BY_UNIT_PRICE)])
+    keyboard_buttons.append([types.KeyboardButton(text="Отмена")])
+
+    return types.ReplyKeyboardMarkup(
+        keyboard=keyboard_buttons,
+        resize_keyboard=True
+    )
+
+
+def cart_item_prices(cat, product_name: str, cart_data: dict):
+    """Цены позиции корзины по магазинам за единицу количества.
+
+    cat — каталог, полученный обработчиком один раз: если во время запроса
+    другой процесс опубликует новый снимок, все позиции всё равно читаются
+    из одной версии. Возвращает ({store: price}, {store: product_name}) или
+    (None, None), если товара нет в каталоге. Для позиции «любой аналог»
+    берётся самый дешёвый за кг/л вариант группы в каждом магазине.
+    """
+    group = cart_data.get('group')
+
+    if group is None:
+        prices = cat.price_dict.get(product_name)
+        if prices is None:
+            return None, None
+        return prices, dict.fromkeys(prices, product_name)
+
+    store_min = cat.group_min.get((group, cart_data.get('fat'), cart_data['unit']))
+    if not store_min:
+        return None, None
+    return ({store: unit_price for store, (unit_price, _) in store_min.items()},
+            {store: variant for store, (_, variant) in store_min.items()})
+
+
+def _words(text: str):
+    return [word.strip(',') for word in text.lower().split()]
+
+
+def _split_query(query: str):
+    """Слова запроса для выбора группы и остаток для отбора внутри неё.
+
+    Группу выбирают слова, пережившие нормализацию и содержащие буквы.
+    Остальное — единицы и недопечатанные числа ("2", "2,5", "2,5%"),
+    их сравнивают с полным названием товара.
+    """
+    group_words = [word for word in normalize_product_name(query).split()
+                   if any(char.isalpha() for char in word)]
+    rest = [word for word in _words(query) if word and word not in group_words]
+    return group_words, rest
+
+
+def _starts_words(parts, words):
+    return all(any(word.startswith(part) for word in words) for part in parts)
+
+
+# Версия каталога, для которой заполнен кэш _search_products
+_search_version = None
+
+
+@functools.lru_cache(maxsize=INLINE_CACHE_SIZE)
+def _search_products(cat, query: str):
+    group_words, rest = _split_query(query)
+
+    results = []
+    matching = cat.find_groups(
+        lambda norm_name: _starts_words(group_words, norm_name.split()))
+    for _, products in matching:
+        for name, store_prices in products:
+            if rest and not _starts_words(rest, _words(name)):
+                continue
+            prices = sorted(store_prices.items(), key=lambda item: item[1])
+            results.append((name, tuple(prices)))
+    return tuple(results)
+
+
+def search_products(query: str):
+    """Товары, у которых слова названия начинаются со слов запроса.
+
+    Слова без единиц выбирают группу, а единицы и числа ("2,5%", "0,9")
+    отбирают варианты внутри неё, в том числе недопечатанные.
+
+    Возвращает ((product_name, ((store, price), ...)), ...), цены по
+    возрастанию. Результат кэшируется до смены версии каталога.
+    """
+    global _search_version
+
+    cat = get_catalog()
+    # при новой версии кэш сбрасывается: старые снимки не держатся в памяти
+    if cat.version != _search_version:
+        _search_products.cache_clear()
+        _search_version = cat.version
+    return _search_products(cat, query.strip().lower())
 
 
 def is_admin(user_id: int) -> bool:
@@ -80,22 +208,20 @@ async def cmd_start(message: types.Message):
         "/optimize - Оптимальное распределение по магазинам (макс. 2 магазина)\n"
         "/clear - Очистить корзину\n"
         "/bye - Завершить сессию\n"
+        "\nПоиск цен в любом чате: наберите @имя_бота и начало названия товара\n"
     )
 
     if is_admin(message.from_user.id):
         welcome_text += "\nАдминские команды:\n"
         welcome_text += "/upload_excel - Загрузить данные из Excel файла\n"
         welcome_text += "/clear_db - Очистить базу данных продуктов\n"
+        welcome_text += "/set_store - Стоимость поездки и минимальный заказ магазина\n"
 
     await message.answer(welcome_text)
 
 
 async def cmd_add(message: types.Message, state: FSMContext):
-    db: Session = SessionLocal()
-    products = db.query(Product).all()
-    db.close()
-
-    if not products:
+    if not get_catalog():
         await message.answer("База данных пуста. Нет доступных продуктов.")
         return
 
@@ -106,22 +232,14 @@ async def cmd_add(message: types.Message, state: FSMContext):
 async def process_product_name(message: types.Message, state: FSMContext):
     user_input = message.text.strip().lower()
 
-    db: Session = SessionLocal()
-    all_products = db.query(Product).all()
-    db.close()
+    cat = get_catalog()
+    grouped_products = cat.grouped_products
 
-    if not all_products:
+    if not grouped_products:
         await message.answer("База данных пуста. Нет доступных продуктов.")
         await state.clear()
         return
 
-    grouped_products = {}
-    for product in all_products:
-        norm_name = normalize_product_name(product.name)
-        if norm_name not in grouped_products:
-            grouped_products[norm_name] = set()
-        grouped_products[norm_name].add(product.name)
-
     normalized_input = normalize_product_name(user_input)
 
     matched_groups = []
@@ -159,7 +277,9 @@ async def process_product_name(message: types.Message, state: FSMContext):
             resize_keyboard=True
         )
 
-        await state.update_data(matched_groups=matched_groups, grouped_products=grouped_products)
+        await state.update_data(matched_groups=matched_groups,
+                                grouped_products={norm_name: list(grouped_products[norm_name])
+                                                  for norm_name in matched_groups})
         await message.answer(f"Найдено несколько категорий. Выберите нужную:", reply_markup=keyboard)
         await state.set_state(CartStates.waiting_for_product_selection)
         return
@@ -168,15 +288,7 @@ async def process_product_name(message: types.Message, state: FSMContext):
     variants = list(grouped_products[norm_name])
 
     if len(variants) > 1:
-        keyboard_buttons = []
-        for variant in sorted(variants)[:10]:
-            keyboard_buttons.append([types.KeyboardButton(text=variant)])
-        keyboard_buttons.append([types.KeyboardButton(text="Отмена")])
-
-        keyboard = types.ReplyKeyboardMarkup(
-            keyboard=keyboard_buttons,
-            resize_keyboard=True
-        )
+        keyboard = variants_keyboard(cat, variants, norm_name)
 
         await state.update_data(product_variants=variants, norm_name=norm_name)
         await message.answer(f"Найдено несколько вариантов товара. Выберите нужный:", reply_markup=keyboard)
@@ -199,6 +311,37 @@ async def process_product_selection(message: types.Message, state: FSMContext):
 
     selected = message.text.strip()
     user_data = await state.get_data()
+    cat = get_catalog()
+
+    if selected == SORT_BY_UNIT_PRICE and user_data.get('product_variants'):
+        norm_name = user_data.get('norm_name')
+        keyboard = variants_keyboard(
+            cat, user_data['product_variants'], norm_name, by_unit_price=True)
+
+        response = "Варианты по цене за кг/л (лучшая цена среди магазинов):\n"
+        for variant in cat.by_unit_price.get(norm_name, [])[:10]:
+            best = cat.best_unit_price(variant)
+            if best is not None:
+                response += f"• {variant}: {best:.2f}₽/{cat.measures[variant][1]}\n"
+            else:
+                response += f"• {variant}: нет веса или объёма\n"
+
+        await message.answer(response, reply_markup=keyboard)
+        return
+
+    equivalents = group_equivalents(cat, user_data.get('norm_name'))
+    if selected in equivalents and user_data.get('product_variants'):
+        norm_name = user_data.get('norm_name')
+        fat, unit = equivalents[selected]
+        fat_text = f"{format_fat(fat)} " if fat is not None else ""
+        product_name = f"{norm_name.capitalize()} {fat_text}(любой, {unit})"
+
+        await state.update_data(product_name=product_name, norm_name=norm_name,
+                                group=norm_name, fat=fat, unit=unit)
+        await message.answer(f"Введите количество в {unit} для товара '{product_name}':",
+                             reply_markup=types.ReplyKeyboardRemove())
+        await state.set_state(CartStates.waiting_for_quantity)
+        return
 
     matched_groups = user_data.get('matched_groups', [])
     grouped_products = user_data.get('grouped_products', {})
@@ -207,16 +350,7 @@ async def process_product_selection(message: types.Message, state: FSMContext):
         if norm_name.capitalize() in selected:
             variants = list(grouped_products[norm_name])
             if len(variants) > 1:
-                keyboard_buttons = []
-                for variant in sorted(variants)[:10]:
-                    keyboard_buttons.append(
-                        [types.KeyboardButton(text=variant)])
-                keyboard_buttons.append([types.KeyboardButton(text="Отмена")])
-
-                keyboard = types.ReplyKeyboardMarkup(
-                    keyboard=keyboard_buttons,
-                    resize_keyboard=True
-                )
+                keyboard = variants_keyboard(cat, variants, norm_name)
 
                 await state.update_data(product_variants=variants, norm_name=norm_name)
                 await message.answer(f"Выберите конкретный товар:", reply_markup=keyboard)
@@ -242,9 +376,10 @@ async def process_product_selection(message: types.Message, state: FSMContext):
 
 
 async def process_quantity(message: types.Message, state: FSMContext):
+    # "0,5" — обычная запись дробных кг и л
+    text = message.text.strip().replace(',', '.')
     try:
-        quantity = float(
-            message.text) if '.' in message.text else int(message.text)
+        quantity = float(text) if '.' in text else int(text)
         if quantity <= 0:
             await message.answer("Количество должно быть положительным числом")
             return
@@ -268,6 +403,10 @@ async def process_quantity(message: types.Message, state: FSMContext):
         session.cart[product_name] = {
             'quantity': quantity
         }
+        if user_data.get('group'):
+            session.cart[product_name]['group'] = user_data['group']
+            session.cart[product_name]['fat'] = user_data.get('fat')
+            session.cart[product_name]['unit'] = user_data['unit']
 
     await message.answer(f"Добавлено {quantity} товара '{product_name}'")
     await state.clear()
@@ -297,26 +436,14 @@ async def cmd_calculate(message: types.Message):
         await message.answer("Корзина пуста. Добавьте товары с помощью /add")
         return
 
-    db: Session = SessionLocal()
-    all_products = db.query(Product).all()
-    db.close()
-
-    price_dict = {}
-    for product in all_products:
-        if product.name not in price_dict:
-            price_dict[product.name] = {}
-        if product.store not in price_dict[product.name]:
-            price_dict[product.name][product.store] = product.price
-        else:
-            price_dict[product.name][product.store] = min(
-                price_dict[product.name][product.store], product.price)
-
+    cat = get_catalog()
     shop_prices = {}
     missing_products = []
 
     for product_name, cart_data in session.cart.items():
-        if product_name in price_dict:
-            for store, price in price_dict[product_name].items():
+        prices, _ = cart_item_prices(cat, product_name, cart_data)
+        if prices is not None:
+            for store, price in prices.items():
                 if store not in shop_prices:
                     shop_prices[store] = 0
                 shop_prices[store] += price * cart_data['quantity']
@@ -353,36 +480,25 @@ async def cmd_calculate(message: types.Message):
 
 
 async def cmd_optimize(message: types.Message):
-    """Оптимальное распределение товаров по магазинам (максимум 2 магазина)"""
+    """Оптимальное распределение товаров по магазинам (максимум MAX_STORES магазинов)"""
     session = get_session(message.from_user.id)
 
     if not session.cart:
         await message.answer("Корзина пуста. Добавьте товары с помощью /add")
         return
 
-    db: Session = SessionLocal()
-    all_products = db.query(Product).all()
-    db.close()
-
-    price_dict = {}
-    for product in all_products:
-        if product.name not in price_dict:
-            price_dict[product.name] = {}
-        if product.store not in price_dict[product.name]:
-            price_dict[product.name][product.store] = product.price
-        else:
-            price_dict[product.name][product.store] = min(
-                price_dict[product.name][product.store], product.price)
-
+    cat = get_catalog()
     products_in_cart = []
     missing_products = []
 
     for product_name, cart_data in session.cart.items():
-        if product_name in price_dict:
+        prices, variants = cart_item_prices(cat, product_name, cart_data)
+        if prices is not None:
             products_in_cart.append({
                 'name': product_name,
                 'quantity': cart_data['quantity'],
-                'prices': price_dict[product_name]
+                'prices': prices,
+                'variants': variants
             })
         else:
             missing_products.append(product_name)
@@ -396,70 +512,45 @@ async def cmd_optimize(message: types.Message):
         return
 
     try:
-        prob = LpProblem("Minimize_Cost", LpMinimize)
-
         shops = set()
         for product_data in products_in_cart:
             shops.update(product_data['prices'].keys())
-        shops = list(shops)
+        shops = sorted(shops)
 
         if not shops:
             await message.answer("Нет данных о магазинах.")
             return
 
-        x = LpVariable.dicts("x",
-                             [(i, j) for i in range(len(products_in_cart))
-                              for j in shops],
-                             0, 1, LpBinary)
-
-        y = LpVariable.dicts("y", shops, 0, 1, LpBinary)
-
-        prob += lpSum(
-            products_in_cart[i]['prices'].get(j, 0) *
-            products_in_cart[i]['quantity'] *
-            x[(i, j)]
-            for i in range(len(products_in_cart)) for j in shops
-        )
-
-        for i in range(len(products_in_cart)):
-            prob += lpSum(x[(i, j)] for j in shops) == 1
-
-        for j in shops:
-            for i in range(len(products_in_cart)):
-                prob += x[(i, j)] <= y[j]
-
-        prob += lpSum(y[j] for j in shops) <= 2
-
-        prob.solve()
-
-        if prob.status == 1:
-            total_cost = 0
-            shop_costs = {shop: 0 for shop in shops}
-            shop_products = {shop: [] for shop in shops}
-
-            for i in range(len(products_in_cart)):
-                for j in shops:
-                    if value(x[(i, j)]) == 1:
-                        price = products_in_cart[i]['prices'].get(j, 0)
-                        if price > 0:
-                            product_cost = price * \
-                                products_in_cart[i]['quantity']
-                            total_cost += product_cost
-                            shop_costs[j] += product_cost
-                            shop_products[j].append({
-                                'name': products_in_cart[i]['name'],
-                                'quantity': products_in_cart[i]['quantity'],
-                                'price': price,
-                                'total': product_cost
-                            })
-
-            used_shops = [shop for shop in shops if shop_costs[shop] > 0]
-
-            if not used_shops:
-                await message.answer("Не удалось найти оптимальное распределение.")
-                return
-
-            response = "Оптимальное распределение товаров (максимум 2 магазина):\n\n"
+        costs = [[product_data['prices'][shop] * product_data['quantity']
+                  if shop in product_data['prices'] else None
+                  for shop in shops]
+                 for product_data in products_in_cart]
+        store_terms = cat.store_terms
+        trip_costs = {shop: store_terms[shop][0] for shop in shops}
+        min_orders = {shop: store_terms[shop][1] for shop in shops}
+
+        solution = optimizer.solve(costs, shops, MAX_STORES, trip_costs, min_orders)
+
+        if solution is not None:
+            total_cost = solution.total
+            shop_costs = {shop: 0 for shop in solution.stores}
+            shop_products = {shop: [] for shop in solution.stores}
+
+            for product_data, shop in zip(products_in_cart, solution.assignment):
+                price = product_data['prices'][shop]
+                product_cost = price * product_data['quantity']
+                shop_costs[shop] += product_cost
+                shop_products[shop].append({
+                    'name': product_data['name'],
+                    'variant': product_data['variants'][shop],
+                    'quantity': product_data['quantity'],
+                    'price': price,
+                    'total': product_cost
+                })
+
+            used_shops = solution.stores
+
+            response = f"Оптимальное распределение товаров (максимум {MAX_STORES} магазина):\n\n"
 
             response += "Состав корзины:\n"
             for product_name, cart_data in session.cart.items():
@@ -467,35 +558,35 @@ async def cmd_optimize(message: types.Message):
             response += "\n"
 
             response += f"Общая минимальная стоимость: {total_cost:.2f}₽\n"
+            if solution.trip_cost > 0:
+                response += f"Из них поездки и доставка: {solution.trip_cost:.2f}₽\n"
             response += f"Используемые магазины: {', '.join(used_shops)}\n\n"
 
             for shop in used_shops:
-                if shop_costs[shop] > 0:
-                    response += f"Магазин: {shop}\n"
-                    response += f"Стоимость в этом магазине: {
-                        shop_costs[shop]:.2f}₽\n"
-                    response += "Товары:\n"
-
-                    for item in shop_products[shop]:
-                        response += f"  {item['name']}: {item['quantity']
-                                                         } × {item['price']}₽ = {item['total']:.2f}₽\n"
-
-                    response += "\n"
-
-            single_shop_prices = {}
-            for shop in shops:
-                total = 0
-                for product_data in products_in_cart:
-                    price = product_data['prices'].get(shop, 0)
-                    if price > 0:
-                        total += price * product_data['quantity']
-                if total > 0:
-                    single_shop_prices[shop] = total
-
-            if single_shop_prices:
-                min_single_shop = min(single_shop_prices,
-                                      key=single_shop_prices.get)
-                min_single_price = single_shop_prices[min_single_shop]
+                response += f"Магазин: {shop}\n"
+                response += f"Стоимость в этом магазине: {
+                    shop_costs[shop]:.2f}₽\n"
+                if trip_costs[shop] > 0:
+                    response += f"Поездка или доставка: {trip_costs[shop]:.2f}₽\n"
+                if min_orders[shop] > 0:
+                    response += f"Минимальный заказ: {min_orders[shop]:.2f}₽\n"
+                response += "Товары:\n"
+
+                for item in shop_products[shop]:
+                    if item['variant'] != item['name']:
+                        response += f"  {item['name']} → {item['variant']}: {
+                            item['quantity']} × {item['price']:.2f}₽ = {item['total']:.2f}₽\n"
+                        continue
+                    response += f"  {item['name']}: {item['quantity']
+                                                     } × {item['price']}₽ = {item['total']:.2f}₽\n"
+
+                response += "\n"
+
+            single = optimizer.solve(costs, shops, 1, trip_costs, min_orders)
+
+            if single is not None:
+                min_single_shop = single.stores[0]
+                min_single_price = single.total
 
                 response += "Сравнение с покупкой в одном магазине:\n"
                 response += f"Минимальная цена в одном магазине ({min_single_shop}): {
@@ -504,9 +595,13 @@ async def cmd_optimize(message: types.Message):
                     min_single_price - total_cost:.2f}₽\n"
                 response += f"Процент экономии: {
                     ((min_single_price - total_cost) / min_single_price * 100):.1f}%"
+            else:
+                response += "Ни в одном магазине нет всей корзины целиком."
 
         else:
             response = "Не удалось найти оптимальное решение."
+            if any(min_orders.values()):
+                response += "\nВозможно, корзина не набирает минимальную сумму заказа в магазинах."
 
     except Exception as e:
         response = f"Ошибка при оптимизации: {str(e)}"
@@ -627,65 +722,14 @@ async def process_excel_file(message: types.Message, state: FSMContext):
             tmp_file.write(downloaded_file.read())
             tmp_file_path = tmp_file.name
 
-        df = pd.read_excel(tmp_file_path, header=None)
-        os.unlink(tmp_file_path)
-
-        if df.shape[1] < 3:
-            await message.answer("Ошибка: файл должен содержать минимум 3 столбца.")
-            return
-
-        db: Session = SessionLocal()
-
-        added_count = 0
-        error_count = 0
-
-        for _, row in df.iterrows():
-            try:
-                if len(row) >= 3:
-                    product_name = str(row[0]).strip()
-                    store_name = str(row[1]).strip()
+        job_id = jobs.submit(message.bot, message.chat.id,
+                             importer.import_excel, tmp_file_path)
 
-                    try:
-                        price = float(row[2])
-                        if price <= 0:
-                            error_count += 1
-                            continue
-                    except (ValueError, TypeError):
-                        error_count += 1
-                        continue
-
-                    existing = db.query(Product).filter(
-                        Product.name == product_name,
-                        Product.store == store_name,
-                        Product.price == price
-                    ).first()
-
-                    if not existing:
-                        product = Product(
-                            name=product_name,
-                            store=store_name,
-                            price=price
-                        )
-                        db.add(product)
-                        added_count += 1
-
-            except Exception as e:
-                error_count += 1
-                print(f"Ошибка при обработке строки: {e}")
-
-        db.commit()
-        db.close()
-
-        report = (
-            f"Данные из Excel файла успешно добавлены.\n\n"
-            f"Статистика:\n"
-            f"- Добавлено новых записей: {added_count}\n"
-            f"- Записей с ошибками: {error_count}\n\n"
-            f"Примечание: существующие записи с такими же ценами не дублируются."
+        await message.answer(
+            f"Файл принят, импорт запущен (задача #{job_id}).\n"
+            "Каталог обновится целиком после проверки, о завершении придёт сообщение."
         )
 
-        await message.answer(report)
-
     except Exception as e:
         await message.answer(f"Ошибка при обработке файла: {str(e)}")
 
@@ -697,13 +741,74 @@ async def cmd_clear_db(message: types.Message):
     if not is_admin(message.from_user.id):
         return
 
-    db: Session = SessionLocal()
-    count = db.query(Product).count()
-    db.query(Product).delete()
-    db.commit()
-    db.close()
+    job_id = jobs.submit(message.bot, message.chat.id, importer.clear_products)
+
+    await message.answer(f"Очистка базы данных продуктов запущена (задача #{job_id}).")
 
-    await message.answer(f"База данных продуктов очищена. Удалено {count} записей.")
+
+async def cmd_set_store(message: types.Message):
+    """Настройка стоимости поездки и минимального заказа магазина"""
+    if not is_admin(message.from_user.id):
+        return
+
+    parts = message.text.split()[1:]
+
+    if not parts:
+        store_terms = get_catalog().store_terms
+        response = (
+            "Формат: /set_store <магазин> <поездка ₽> <мин. заказ ₽>\n"
+            "Пример: /set_store Пятерочка 0 500\n\n"
+            "Текущие настройки:\n"
+        )
+        for store, (trip_cost, min_order) in sorted(store_terms.items()):
+            response += f"• {store}: поездка {trip_cost:.2f}₽, мин. заказ {min_order:.2f}₽\n"
+        await message.answer(response)
+        return
+
+    try:
+        store = " ".join(parts[:-2])
+        trip_cost = float(parts[-2].replace(',', '.'))
+        min_order = float(parts[-1].replace(',', '.'))
+        if not store or trip_cost < 0 or min_order < 0:
+            raise ValueError
+    except (ValueError, IndexError):
+        await message.answer("Формат: /set_store <магазин> <поездка ₽> <мин. заказ ₽>")
+        return
+
+    if store not in get_catalog().store_terms:
+        await message.answer(f"Магазин '{store}' не найден в базе.")
+        return
+
+    await asyncio.to_thread(importer.set_store_terms, store, trip_cost, min_order)
+    await message.answer(
+        f"Магазин {store}: поездка {trip_cost:.2f}₽, минимальный заказ {min_order:.2f}₽")
+
+
+async def process_inline_query(inline_query: types.InlineQuery):
+    """Подсказки по мере ввода: @bot мол…"""
+    query = inline_query.query.strip()
+    try:
+        offset = int(inline_query.offset or 0)
+    except ValueError:
+        offset = 0
+
+    results = search_products(query) if query else ()
+    page = results[offset:offset + INLINE_PAGE_SIZE]
+    next_offset = offset + INLINE_PAGE_SIZE
+    next_offset = str(next_offset) if next_offset < len(results) else ""
+
+    articles = []
+    for index, (name, prices) in enumerate(page, offset):
+        text = f"{name}\n" + "".join(f"  {store}: {price:.2f}₽\n" for store, price in prices)
+        articles.append(types.InlineQueryResultArticle(
+            id=str(index),
+            title=name,
+            description=" · ".join(f"{store} {price:.2f}₽" for store, price in prices[:3]),
+            input_message_content=types.InputTextMessageContent(message_text=text),
+        ))
+
+    await inline_query.answer(articles, cache_time=INLINE_CACHE_TIME,
+                              next_offset=next_offset)
 
 
 def register_handlers(dp: Dispatcher):
@@ -718,6 +823,7 @@ def register_handlers(dp: Dispatcher):
 
     dp.message.register(cmd_upload_excel, Command("upload_excel"))
     dp.message.register(cmd_clear_db, Command("clear_db"))
+    dp.message.register(cmd_set_store, Command("set_store"))
 
     dp.message.register(process_product_name, CartStates.waiting_for_product)
     dp.message.register(process_product_selection,
@@ -728,3 +834,5 @@ def register_handlers(dp: Dispatcher):
 
     dp.message.register(process_excel_file, ExcelUploadStates.waiting_for_file,
                         F.content_type == ContentType.DOCUMENT)
+
+    dp.inline_query.register(process_inline_query)
@@ -0,0 +1,179 @@
+import contextlib
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: бот работает в одном процессе, снимки версионные
+    fcntl = None
+
+from sqlalchemy import MetaData, select, func, or_, text
+from database import SessionLocal, engine
+from models import Product, Store
+from units import UNIT_COLUMNS, parse_units_column
+import catalog
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = f"{Product.__tablename__}_staging"
+OLD_TABLE = f"{Product.__tablename__}_old"
+
+_COLUMNS = ('name', 'store', 'price') + UNIT_COLUMNS
+LOCK_PATH = f"{catalog.SNAPSHOT_PATH}.lock"
+
+
+class ValidationError(Exception):
+    pass
+
+
+def _create_staging(conn, copy_live: bool):
+    staging = Product.__table__.to_metadata(MetaData(), name=STAGING_TABLE)
+    staging.drop(conn, checkfirst=True)
+    staging.create(conn)
+
+    if copy_live:
+        columns = ", ".join(_COLUMNS)
+        conn.execute(text(
+            f"INSERT INTO {STAGING_TABLE} ({columns}) "
+            f"SELECT {columns} FROM {Product.__tablename__}"))
+    return staging
+
+
+def _validate(conn, staging, expected_count: int):
+    count = conn.execute(select(func.count()).select_from(staging)).scalar()
+    if count != expected_count:
+        raise ValidationError(
+            f"в промежуточной таблице {count} записей вместо {expected_count}")
+
+    broken = conn.execute(select(func.count()).select_from(staging).where(or_(
+        staging.c.price <= 0, staging.c.name == '', staging.c.store == ''))).scalar()
+    if broken:
+        raise ValidationError(f"{broken} записей с пустым названием или ценой")
+
+
+def _swap(conn):
+    """Подменяет живую таблицу промежуточной одной транзакцией.
+
+    pysqlite не открывает транзакцию перед DDL сам, поэтому BEGIN явный:
+    читатели видят либо старую таблицу целиком, либо новую.
+    """
+    live = Product.__tablename__
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    conn.exec_driver_sql(f"ALTER TABLE {live} RENAME TO {OLD_TABLE}")
+    conn.exec_driver_sql(f"ALTER TABLE {STAGING_TABLE} RENAME TO {live}")
+    conn.exec_driver_sql(f"DROP TABLE {OLD_TABLE}")
+    conn.commit()
+
+
+@contextlib.contextmanager
+def _publish_lock():
+    """Межпроцессная блокировка: в режиме воркеров импорт идёт в любом из процессов"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(LOCK_PATH, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _publish(rows, copy_live: bool):
+    """Загружает строки в промежуточную таблицу, проверяет и подменяет живую.
+
+    Вызывается под _publish_lock().
+    """
+    with engine.connect() as conn:
+        staging = _create_staging(conn, copy_live)
+        conn.commit()
+
+        try:
+            base_count = conn.execute(
+                select(func.count()).select_from(staging)).scalar()
+            if rows:
+                conn.execute(staging.insert(), rows)
+            _validate(conn, staging, base_count + len(rows))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            staging.drop(conn, checkfirst=True)
+            conn.commit()
+            raise
+
+        _swap(conn)
+
+    return catalog.reload()
+
+
+def import_excel(path: str) -> str:
+    """Фоновая задача импорта Excel файла. Возвращает текст отчёта"""
+    import pandas as pd
+
+    try:
+        df = pd.read_excel(path, header=None)
+    finally:
+        os.unlink(path)
+
+    if df.shape[1] < 3:
+        return "Ошибка: файл должен содержать минимум 3 столбца."
+
+    names = df[0].astype(str).str.strip()
+    stores = df[1].astype(str).str.strip()
+    prices = pd.to_numeric(df[2], errors='coerce')
+
+    # пустые ячейки отбрасываются построчно, как и нечисловые цены;
+    # _validate остаётся только страховкой
+    valid = (prices > 0) & names.notna() & names.ne('') & stores.notna() & stores.ne('')
+    error_count = int((~valid).sum())
+
+    rows = pd.DataFrame({'name': names, 'store': stores, 'price': prices})[valid]
+    rows = rows.join(parse_units_column(names[valid]))
+    rows = rows.drop_duplicates(subset=['name', 'store', 'price'])
+
+    with _publish_lock():
+        existing = set(catalog.get_catalog().rows())
+        keys = list(zip(rows['name'], rows['store'], rows['price']))
+        rows = rows[[key not in existing for key in keys]]
+
+        records = rows.astype(object).where(rows.notna(), None).to_dict('records')
+        try:
+            cat = _publish(records, copy_live=True) if records else catalog.get_catalog()
+        except ValidationError as e:
+            logger.warning("Import rejected: %s", e)
+            return f"Импорт отменён, база не изменена: {e}"
+
+    return (
+        f"Данные из Excel файла успешно добавлены.\n\n"
+        f"Статистика:\n"
+        f"- Добавлено новых записей: {len(records)}\n"
+        f"- Записей с ошибками: {error_count}\n"
+        f"- Версия каталога: {cat.version}\n\n"
+        f"Примечание: существующие записи с такими же ценами не дублируются."
+    )
+
+
+def clear_products() -> str:
+    """Фоновая задача очистки таблицы продуктов"""
+    with _publish_lock():
+        count = len(catalog.get_catalog())
+        cat = _publish([], copy_live=False)
+    return (f"База данных продуктов очищена. Удалено {count} записей.\n"
+            f"Версия каталога: {cat.version}")
+
+
+def set_store_terms(name: str, trip_cost: float, min_order: float):
+    """Сохраняет стоимость поездки и минимальный заказ магазина"""
+    with _publish_lock():
+        db = SessionLocal()
+        store = db.query(Store).filter(Store.name == name).first()
+        if store is None:
+            store = Store(name=name)
+            db.add(store)
+        store.trip_cost = trip_cost
+        store.min_order = min_order
+        db.commit()
+        db.close()
+
+        return catalog.reload()
@@ -0,0 +1,34 @@
+import asyncio
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+_job_ids = itertools.count(1)
+# Импорты и очистки идут строго по одной, чтобы не потерять строки при подмене
+_lock = asyncio.Lock()
+
+jobs = {}  # {job_id: asyncio.Task}
+
+
+def submit(bot, chat_id: int, func, *args) -> int:
+    """Запускает блокирующую функцию в фоне и сообщает результат в чат.
+
+    func выполняется в отдельном потоке и возвращает текст отчёта.
+    """
+    job_id = next(_job_ids)
+    jobs[job_id] = asyncio.create_task(_run(job_id, bot, chat_id, func, args))
+    return job_id
+
+
+async def _run(job_id: int, bot, chat_id: int, func, args):
+    try:
+        async with _lock:
+            report = await asyncio.to_thread(func, *args)
+    except Exception as e:
+        logger.exception("Job #%d failed", job_id)
+        report = f"Ошибка: {str(e)}"
+    finally:
+        jobs.pop(job_id, None)
+
+    await bot.send_message(chat_id, f"Задача #{job_id} завершена.\n\n{report}")
@@ -1,10 +1,15 @@
 import asyncio
+import functools
 import logging
+import multiprocessing
 import os
 
 from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
 from database import init_db
+import catalog
 from handlers import register_handlers
 from dotenv import load_dotenv
 
@@ -13,23 +18,144 @@ logging.basicConfig(level=logging.INFO)
 load_dotenv()
 
 API_TOKEN = os.getenv("TOKEN")
+# Число процессов-обработчиков; при 1 бот работает в одном процессе как раньше
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=MemoryStorage())
+    register_handlers(dp)
+    return dp
 
 
 async def main():
     init_db()
     print("Database initialized")
 
-    bot = Bot(token=API_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    catalog.load()
 
-    register_handlers(dp)
+    bot = Bot(token=API_TOKEN)
+    dp = create_dispatcher()
 
     print("Bot started...")
     await dp.start_polling(bot)
 
+
+def update_user_id(update: Update) -> int:
+    user = getattr(update.event, "from_user", None)
+    return user.id if user else 0
+
+
+def worker_index(update: Update) -> int:
+    """Апдейты одного пользователя всегда идут в один процесс: там его корзина и FSM"""
+    return update_user_id(update) % WORKERS
+
+
+def run_worker(queue):
+    try:
+        asyncio.run(worker(queue))
+    except KeyboardInterrupt:
+        pass
+
+
+async def worker(queue):
+    """Процесс-обработчик: берёт апдейты из очереди и отдаёт их диспетчеру.
+
+    Каталог не загружается заново, а отображается из снимка, который
+    подготовил главный процесс, поэтому все воркеры делят одни страницы.
+    """
+    catalog.get_catalog()
+
+    bot = Bot(token=API_TOKEN)
+    dp = create_dispatcher()
+    loop = asyncio.get_running_loop()
+    # {user_id: задача последнего апдейта}; апдейты пользователя идут по порядку
+    pending = {}
+
+    async def handle(previous, update):
+        if previous is not None:
+            await asyncio.wait([previous])
+        await dp.feed_update(bot, update)
+
+    def forget(user_id, task):
+        if pending.get(user_id) is task:
+            del pending[user_id]
+
+    while True:
+        data = await loop.run_in_executor(None, queue.get)
+        if data is None:
+            break
+
+        update = Update.model_validate(data, context={"bot": bot})
+        user_id = update_user_id(update)
+        task = asyncio.create_task(handle(pending.get(user_id), update))
+        pending[user_id] = task
+        task.add_done_callback(functools.partial(forget, user_id))
+
+    await asyncio.gather(*pending.values(), return_exceptions=True)
+    await bot.session.close()
+
+
+def start_worker(context, queue):
+    process = context.Process(target=run_worker, args=(queue,), daemon=True)
+    process.start()
+    return process
+
+
+def restart_dead_workers(context, queues, workers):
+    """Перезапускает упавшие воркеры, иначе их пользователи остаются без ответа.
+
+    Новый процесс читает ту же очередь, поэтому накопленные апдейты не теряются.
+    """
+    for index, process in enumerate(workers):
+        if not process.is_alive():
+            logging.error("Worker %d (pid %s) exited with code %s, restarting",
+                          index, process.pid, process.exitcode)
+            workers[index] = start_worker(context, queues[index])
+
+
+async def serve_workers():
+    """Главный процесс в режиме воркеров: опрашивает Telegram и раздаёт апдейты"""
+    init_db()
+    print("Database initialized")
+
+    catalog.load()
+
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(WORKERS)]
+    workers = [start_worker(context, queue) for queue in queues]
+
+    bot = Bot(token=API_TOKEN)
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+    offset = None
+
+    print(f"Bot started with {WORKERS} workers...")
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=30,
+                                                allowed_updates=allowed_updates)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logging.warning("Failed to fetch updates: %s", e)
+                await asyncio.sleep(1)
+                continue
+
+            restart_dead_workers(context, queues, workers)
+
+            for update in updates:
+                offset = update.update_id + 1
+                queues[worker_index(update)].put(update.model_dump(
+                    mode="json", exclude_unset=True, by_alias=True))
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for process in workers:
+            process.join(timeout=5)
+        await bot.session.close()
+
+
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        asyncio.run(main() if WORKERS == 1 else serve_workers())
     except (KeyboardInterrupt, SystemExit):
         print("Bot stopped")
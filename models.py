@@ -12,10 +12,29 @@ class Product(Base):
     store = Column(String, nullable=False)
     price = Column(Float, nullable=False)
 
+    # Разобранные из названия единицы (см. units.parse_units)
+    fat = Column(Float)
+    volume = Column(Float)
+    weight = Column(Float)
+    pack = Column(Float)
+
     def __repr__(self):
         return f"Product(name={self.name}, store={self.store}, price={self.price})"
 
 
+class Store(Base):
+    __tablename__ = 'stores'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    # Стоимость поездки или доставки и минимальная сумма заказа, ₽
+    trip_cost = Column(Float, nullable=False, default=0)
+    min_order = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"Store(name={self.name}, trip_cost={self.trip_cost}, min_order={self.min_order})"
+
+
 class Admin(Base):
     __tablename__ = 'admins'
 
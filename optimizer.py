@@ -0,0 +1,253 @@
+import itertools
+import math
+
+# Сколько узлов перебора допускается до перехода на CBC
+NODE_LIMIT = 20_000
+_EPS = 1e-9
+
+
+class Solution:
+    """Распределение позиций корзины по магазинам"""
+
+    def __init__(self, assignment, item_cost, trip_cost):
+        self.assignment = assignment  # [store] для каждой позиции
+        self.item_cost = item_cost
+        self.trip_cost = trip_cost
+
+    @property
+    def total(self):
+        return self.item_cost + self.trip_cost
+
+    @property
+    def stores(self):
+        return sorted(set(self.assignment))
+
+    def __repr__(self):
+        return f"Solution(total={self.total:.2f}, stores={self.stores})"
+
+
+class NodeLimitExceeded(Exception):
+    pass
+
+
+def _store_terms(stores, trip_costs, min_orders):
+    trip = [(trip_costs or {}).get(store, 0) for store in stores]
+    minimum = [(min_orders or {}).get(store, 0) for store in stores]
+    return trip, minimum
+
+
+def _solve_subset(costs, subset, trip, min_order, best, budget):
+    """Точный поиск для фиксированного набора магазинов.
+
+    costs[i][j] — стоимость позиции i в магазине j (None, если товара нет).
+    Возвращает (стоимость товаров, назначение) или None, если не лучше best.
+    """
+    options = []
+    for row in costs:
+        choices = sorted((row[j], j) for j in subset if row[j] is not None)
+        if not choices:
+            return None
+        options.append(choices)
+
+    trip_total = sum(trip[j] for j in subset)
+    lower = sum(choices[0][0] for choices in options)
+    if lower + trip_total >= best - _EPS:
+        return None
+
+    totals = dict.fromkeys(subset, 0.0)
+    for choices in options:
+        totals[choices[0][1]] += choices[0][0]
+    if all(totals[j] >= min_order[j] - _EPS for j in subset):
+        return lower, [choices[0][1] for choices in options]
+
+    # Ветви и границы: сначала позиции с наибольшей разницей цен
+    order = sorted(range(len(options)), key=lambda i: (
+        len(options[i]) > 1, -(options[i][-1][0] - options[i][0][0])))
+    n = len(order)
+    short = [j for j in subset if min_order[j] > 0]
+
+    # Для оставшихся позиций k..n-1: минимум и максимум стоимости, сколько ещё
+    # может получить магазин, сумма в магазине при самом дешёвом выборе и
+    # варианты «перенести позицию в магазин j» как (доплата на рубль, цена, доплата)
+    rest_min = [0.0] * (n + 1)
+    rest_top = [0.0] * (n + 1)
+    rest_max = [dict.fromkeys(subset, 0.0) for _ in range(n + 1)]
+    rest_cheap = [dict.fromkeys(subset, 0.0) for _ in range(n + 1)]
+    moves = [{j: [] for j in short} for _ in range(n + 1)]
+    for k in range(n - 1, -1, -1):
+        choices = options[order[k]]
+        cheapest, cheapest_store = choices[0]
+        rest_min[k] = rest_min[k + 1] + cheapest
+        rest_top[k] = rest_top[k + 1] + choices[-1][0]
+        rest_max[k] = dict(rest_max[k + 1])
+        rest_cheap[k] = dict(rest_cheap[k + 1])
+        rest_cheap[k][cheapest_store] += cheapest
+        for cost, j in choices:
+            rest_max[k][j] += cost
+        for j in short:
+            moves[k][j] = list(moves[k + 1][j])
+            for cost, store in choices[1:]:
+                if store == j and cost > 0:
+                    moves[k][j].append(((cost - cheapest) / cost, cost, cost - cheapest))
+            moves[k][j].sort()
+
+    def penalty(k):
+        """Нижняя оценка доплаты за добор минимальных сумм (дробный рюкзак)"""
+        extra = 0.0
+        for j in short:
+            deficit = min_order[j] - totals[j] - rest_cheap[k][j]
+            for _, cost, surcharge in moves[k][j]:
+                if deficit <= _EPS:
+                    break
+                take = min(1.0, deficit / cost)
+                extra += surcharge * take
+                deficit -= cost * take
+        return extra
+
+    limit = best - trip_total
+    found = None
+    current = [0] * len(options)
+    totals = dict.fromkeys(subset, 0.0)
+
+    def search(k, cost):
+        nonlocal limit, found
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise NodeLimitExceeded
+        # каждая позиция достаётся одному магазину, поэтому недостающие суммы
+        # должны покрываться и по отдельности, и вместе
+        missing = 0.0
+        for j in short:
+            deficit = min_order[j] - totals[j]
+            if deficit > rest_max[k][j] + _EPS:
+                return
+            missing += max(deficit, 0.0)
+        if missing > rest_top[k] + _EPS:
+            return
+        if cost + rest_min[k] + penalty(k) >= limit - _EPS:
+            return
+        if k == n:
+            limit = cost
+            found = (cost, list(current))
+            return
+        i = order[k]
+        for item_cost, j in options[i]:
+            current[i] = j
+            totals[j] += item_cost
+            search(k + 1, cost + item_cost)
+            totals[j] -= item_cost
+
+    search(0, 0.0)
+    return found
+
+
+def solve_exact(costs, stores, max_stores=2, trip_costs=None, min_orders=None,
+                node_limit=NODE_LIMIT):
+    """Точное решение перебором наборов магазинов с ветвями и границами.
+
+    Наборы перебираются по возрастанию нижней оценки, поэтому обычно
+    решение находится на первых наборах, а остальные отсекаются.
+    Возвращает Solution или None, если допустимого распределения нет.
+    Если перебор превышает node_limit, выбрасывает NodeLimitExceeded.
+    """
+    trip, min_order = _store_terms(stores, trip_costs, min_orders)
+
+    candidates = []
+    for size in range(1, min(max_stores, len(stores)) + 1):
+        for subset in itertools.combinations(range(len(stores)), size):
+            lower = sum(trip[j] for j in subset)
+            for row in costs:
+                known = [row[j] for j in subset if row[j] is not None]
+                if not known:
+                    break
+                lower += min(known)
+            else:
+                candidates.append((lower, subset))
+    candidates.sort()
+
+    best = math.inf
+    best_solution = None
+    budget = [node_limit]
+    for lower, subset in candidates:
+        if lower >= best - _EPS:
+            break
+        result = _solve_subset(costs, subset, trip, min_order, best, budget)
+        if result is None:
+            continue
+        item_cost, assignment = result
+        trip_total = sum(trip[j] for j in set(assignment))
+        if item_cost + trip_total < best - _EPS:
+            best = item_cost + trip_total
+            best_solution = Solution([stores[j] for j in assignment],
+                                     item_cost, trip_total)
+
+    return best_solution
+
+
+def build_milp(costs, stores, max_stores=2, trip_costs=None, min_orders=None):
+    """Та же модель в PuLP. Возвращает (prob, x) для run_milp"""
+    from pulp import LpProblem, LpMinimize, LpVariable, lpSum, LpBinary
+
+    trip, min_order = _store_terms(stores, trip_costs, min_orders)
+    pairs = [(i, j) for i, row in enumerate(costs)
+             for j in range(len(stores)) if row[j] is not None]
+
+    prob = LpProblem("Minimize_Cost", LpMinimize)
+    x = LpVariable.dicts("x", pairs, 0, 1, LpBinary)
+    y = LpVariable.dicts("y", range(len(stores)), 0, 1, LpBinary)
+
+    prob += (lpSum(costs[i][j] * x[(i, j)] for i, j in pairs) +
+             lpSum(trip[j] * y[j] for j in range(len(stores))))
+
+    for i in range(len(costs)):
+        prob += lpSum(x[(i, j)] for j in range(len(stores)) if (i, j) in x) == 1
+
+    for i, j in pairs:
+        prob += x[(i, j)] <= y[j]
+
+    for j in range(len(stores)):
+        if min_order[j] > 0:
+            prob += lpSum(costs[i][j] * x[(i, j)]
+                          for i in range(len(costs)) if (i, j) in x) >= min_order[j] * y[j]
+
+    prob += lpSum(y[j] for j in range(len(stores))) <= max_stores
+
+    return prob, x
+
+
+def run_milp(model, costs, stores, trip_costs=None):
+    """Решает модель из build_milp через CBC. Возвращает Solution или None"""
+    from pulp import LpStatusOptimal, PULP_CBC_CMD, value
+
+    prob, x = model
+    prob.solve(PULP_CBC_CMD(msg=False))
+    if prob.status != LpStatusOptimal:
+        return None
+
+    trip, _ = _store_terms(stores, trip_costs, None)
+    assignment = []
+    for i in range(len(costs)):
+        assignment.append(next(j for j in range(len(stores))
+                               if (i, j) in x and value(x[(i, j)]) > 0.5))
+    item_cost = sum(costs[i][j] for i, j in enumerate(assignment))
+    trip_total = sum(trip[j] for j in set(assignment))
+    return Solution([stores[j] for j in assignment], item_cost, trip_total)
+
+
+def solve_milp(costs, stores, max_stores=2, trip_costs=None, min_orders=None):
+    model = build_milp(costs, stores, max_stores, trip_costs, min_orders)
+    return run_milp(model, costs, stores, trip_costs)
+
+
+def solve(costs, stores, max_stores=2, trip_costs=None, min_orders=None):
+    """Оптимальное распределение позиций по не более чем max_stores магазинам.
+
+    costs[i][j] — стоимость позиции i целиком в магазине stores[j] или None.
+    trip_costs и min_orders — {store: ₽}: стоимость поездки или доставки и
+    минимальная сумма заказа в магазине. Для обычных корзин задача решается
+    перебором; CBC запускается, только если перебор слишком велик.
+    """
+    try:
+        return solve_exact(costs, stores, max_stores, trip_costs, min_orders)
+    except NodeLimitExceeded:
+        return solve_milp(costs, stores, max_stores, trip_costs, min_orders)
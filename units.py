@@ -0,0 +1,95 @@
+import re
+
+# Одно выражение на все единицы: жирность, вес, объём и количество в упаковке.
+# "кг" проверяется раньше "г", а просмотр вперёд не даёт съесть начало слова
+# ("2 груши" не превращается в "2 г" + "руши").
+UNITS_RE = re.compile(
+    r'(?P<num>\d+(?:[.,]\d+)?)\s*'
+    r'(?:(?P<fat>%)'
+    r'|(?P<kg>кг|kg)'
+    r'|(?P<g>гр|г|g)'
+    r'|(?P<ml>мл|ml)'
+    r'|(?P<l>л|l)'
+    r'|(?P<pcs>шт[а-яё]*)'
+    r'|(?P<pack>пак[а-яё]*))'
+    r'(?![а-яёa-z])'
+)
+_SPACES_RE = re.compile(r'\s+')
+
+UNIT_COLUMNS = ('fat', 'volume', 'weight', 'pack')
+
+
+def _number(text: str) -> float:
+    return float(text.replace(',', '.'))
+
+
+def parse_units(name: str) -> dict:
+    """Разбирает название товара на жирность (%), объём (л), вес (кг) и штуки"""
+    result = dict.fromkeys(UNIT_COLUMNS)
+
+    for match in UNITS_RE.finditer(name.lower()):
+        num = _number(match['num'])
+        if match['fat']:
+            result['fat'] = num
+        elif match['kg']:
+            result['weight'] = num
+        elif match['g']:
+            result['weight'] = num / 1000
+        elif match['ml']:
+            result['volume'] = num / 1000
+        elif match['l']:
+            result['volume'] = num
+        else:
+            result['pack'] = num
+
+    return result
+
+
+def normalize_product_name(name: str) -> str:
+    name = UNITS_RE.sub('', name.lower())
+    name = _SPACES_RE.sub(' ', name)
+    return name.strip(' ,')
+
+
+def parse_units_column(names):
+    """Векторный вариант parse_units для столбца pandas.
+
+    Возвращает DataFrame с тем же индексом и столбцами fat, volume,
+    weight и pack.
+    """
+    import pandas as pd
+
+    lowered = names.astype(str).str.lower()
+    matches = lowered.str.extractall(UNITS_RE)
+
+    result = pd.DataFrame(index=names.index, columns=list(UNIT_COLUMNS),
+                          dtype=float)
+
+    if not matches.empty:
+        num = matches['num'].str.replace(',', '.', regex=False).astype(float)
+        scaled = {
+            'fat': num.where(matches['fat'].notna()),
+            'weight': num.where(matches['kg'].notna()).fillna(
+                num.where(matches['g'].notna()) / 1000),
+            'volume': num.where(matches['l'].notna()).fillna(
+                num.where(matches['ml'].notna()) / 1000),
+            'pack': num.where(matches['pcs'].notna() | matches['pack'].notna()),
+        }
+        # как и в parse_units, при повторе единицы побеждает последнее значение
+        for column, values in scaled.items():
+            result[column] = values.groupby(level=0).last().reindex(names.index)
+    return result
+
+
+def unit_measure(volume, weight, pack):
+    """Количество кг или л в товаре с учётом штук в упаковке: (amount, unit)"""
+    if weight:
+        amount, unit = weight, 'кг'
+    elif volume:
+        amount, unit = volume, 'л'
+    else:
+        return None, None
+
+    if pack:
+        amount *= pack
+    return amount, unit